@@ -1,7 +1,10 @@
 import * as fs from "fs";
 import * as path from "path";
 import * as os from "os";
-import { spawn, execSync } from "child_process";
+import * as dns from "dns";
+import * as net from "net";
+import { once } from "events";
+import { spawn, execSync, execFileSync, ChildProcess } from "child_process";
 import { Logger } from "winston";
 import { createLogger } from "./Logger.js";
 import { M3U8ProcessorConfig } from "../types/index.js";
@@ -35,6 +38,141 @@ async function loadFFmpegStatic(): Promise<string | null> {
     }
 }
 
+// H.264 encoder for re-encoding fallback (probed once per FFmpeg binary)
+const HARDWARE_H264_ENCODERS = [
+    "h264_nvenc",
+    "h264_qsv",
+    "h264_videotoolbox",
+];
+const h264Encoders = new Map<string, string>();
+
+function detectH264Encoder(ffmpegPath: string): string {
+    const cached = h264Encoders.get(ffmpegPath);
+    if (cached) {
+        return cached;
+    }
+
+    let encoder = "libx264";
+    try {
+        // argv array, no shell - the path may come from --ffmpeg
+        const output = execFileSync(
+            ffmpegPath,
+            ["-hide_banner", "-encoders"],
+            {
+                encoding: "utf8",
+                stdio: ["ignore", "pipe", "ignore"],
+            }
+        );
+        encoder =
+            HARDWARE_H264_ENCODERS.find((name) =>
+                new RegExp(`\\s${name}\\s`).test(output)
+            ) || "libx264";
+    } catch {
+        // Keep libx264
+    }
+
+    h264Encoders.set(ffmpegPath, encoder);
+    return encoder;
+}
+
+/**
+ * Speed-oriented encoder options (all encoders run with -threads 0)
+ */
+function h264EncoderArgs(encoder: string): string[] {
+    switch (encoder) {
+        case "h264_nvenc":
+            return ["-preset", "p4"];
+        case "h264_qsv":
+            return ["-preset", "veryfast"];
+        case "h264_videotoolbox":
+            return [];
+        default:
+            return ["-preset", "veryfast", "-tune", "zerolatency"];
+    }
+}
+
+// Shorter input analysis for the piped mux (1MB / 1s instead of ffmpeg's
+// 5MB / 5s default) when the playlist already told us what streams exist
+const SHORT_PROBE_ARGS = [
+    "-probesize",
+    "1000000",
+    "-analyzeduration",
+    "1000000",
+];
+
+// MPEG-TS packets are 188 bytes, each starting with sync byte 0x47
+const TS_PACKET_SIZE = 188;
+const TS_SYNC_BYTE = 0x47;
+
+// Leading packets inspected before trusting that a body is TS at all
+const TS_HEAD_PACKETS = 3;
+
+/**
+ * Check whether a segment is TS that got cut off mid-packet: the leading
+ * packets carry sync bytes but the total length is not whole packets
+ */
+function looksTruncatedTs(head: Buffer, size: number): boolean {
+    if (size % TS_PACKET_SIZE === 0) {
+        return false;
+    }
+    const packets = Math.min(
+        TS_HEAD_PACKETS,
+        Math.ceil(Math.min(head.length, size) / TS_PACKET_SIZE)
+    );
+    if (packets === 0) {
+        return false;
+    }
+    for (let i = 0; i < packets; i++) {
+        if (head[i * TS_PACKET_SIZE] !== TS_SYNC_BYTE) {
+            return false;
+        }
+    }
+    return true;
+}
+
+/**
+ * Truncation check for an in-memory segment
+ */
+function chunksLookTruncated(chunks: Buffer[]): boolean {
+    let size = 0;
+    for (const chunk of chunks) {
+        size += chunk.length;
+    }
+    return chunks.length > 0 && looksTruncatedTs(chunks[0], size);
+}
+
+/**
+ * Truncation check for a segment on disk, reading only its first packets
+ */
+async function fileLooksTruncated(file: string): Promise<boolean> {
+    const handle = await fs.promises.open(file, "r");
+    try {
+        const { size } = await handle.stat();
+        const head = Buffer.alloc(TS_HEAD_PACKETS * TS_PACKET_SIZE);
+        const { bytesRead } = await handle.read(head, 0, head.length, 0);
+        return looksTruncatedTs(head.subarray(0, bytesRead), size);
+    } finally {
+        await handle.close();
+    }
+}
+
+// EXACT headers from working Python script (lines 26-38 in m3u8_downloader.py)
+const DEFAULT_HEADERS: Readonly<Record<string, string>> = Object.freeze({
+    "User-Agent":
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    Accept: "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    DNT: "1",
+    Connection: "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Cache-Control": "max-age=0",
+});
+
 // Direct TypeScript port of Python m3u8_downloader.py
 interface Segment {
     uri: string;
@@ -55,9 +193,17 @@ interface PlaylistInfo {
     };
 }
 
+// Outcome of the piped download + mux
+type PipeResult = "success" | "download_failed" | "mux_failed";
+
 // Simple curl-based downloader - more reliable than custom HTTP implementation
 class SimpleDownloader {
     private defaultHeaders: Record<string, string> = {};
+    // Fixed flags + default header args, built once per header set
+    private baseCurlArgs: string[] | null = null;
+    // hostname -> addresses, resolved once and pinned for every curl process
+    // until a request to that host fails
+    private resolvedHosts = new Map<string, Promise<string[] | null>>();
 
     constructor(
         config: {
@@ -67,104 +213,193 @@ class SimpleDownloader {
         this.defaultHeaders = config.headers || {};
     }
 
-    get defaults() {
-        return {
-            headers: {
-                common: this.defaultHeaders,
-            },
-        };
+    /**
+     * Replace the session headers sent with every request
+     */
+    setHeaders(headers: Record<string, string>): void {
+        this.defaultHeaders = headers;
+        this.baseCurlArgs = null;
     }
 
     /**
-     * Download file using curl - much more reliable than custom HTTP implementation
+     * Build curl arguments shared by file and in-memory downloads
      */
-    async downloadFile(
-        url: string,
-        outputPath: string,
-        headers?: Record<string, string>
-    ): Promise<boolean> {
-        try {
-            const allHeaders = { ...this.defaultHeaders, ...headers };
-
-            // Build curl arguments array (avoid shell parsing issues)
-            const curlArgs = [
-                "-L", // Follow redirects
-                "--fail", // Fail on HTTP errors
-                "--silent", // Silent mode
-                "--show-error", // Show errors
-                "--max-time",
-                "60", // 60 second timeout
-                "--retry",
-                "3", // Retry 3 times
-                "--retry-delay",
-                "2", // 2 second delay between retries
-            ];
+    private buildCurlArgs(headers?: Record<string, string>): string[] {
+        if (!headers) {
+            if (!this.baseCurlArgs) {
+                this.baseCurlArgs = this.createCurlArgs(this.defaultHeaders);
+            }
+            // Callers append URL/output, so hand out a copy
+            return this.baseCurlArgs.slice();
+        }
 
-            // Add headers (properly escaped)
-            for (const [key, value] of Object.entries(allHeaders)) {
-                if (value) {
-                    curlArgs.push("-H", `${key}: ${value}`);
-                }
+        return this.createCurlArgs({ ...this.defaultHeaders, ...headers });
+    }
+
+    /**
+     * Assemble curl flags and -H arguments for the given headers
+     */
+    private createCurlArgs(allHeaders: Record<string, string>): string[] {
+        // Build curl arguments array (avoid shell parsing issues)
+        const curlArgs = [
+            "-L", // Follow redirects
+            "--compressed", // Decode gzip/deflate/br bodies (we send Accept-Encoding)
+            "--fail", // Fail on HTTP errors
+            "--silent", // Silent mode
+            "--show-error", // Show errors
+            "--max-time",
+            "60", // 60 second timeout
+            "--retry",
+            "3", // Retry 3 times
+            "--retry-delay",
+            "2", // 2 second delay between retries
+        ];
+
+        // Add headers (properly escaped)
+        for (const [key, value] of Object.entries(allHeaders)) {
+            if (value) {
+                curlArgs.push("-H", `${key}: ${value}`);
             }
+        }
 
-            // Add URL and output
-            curlArgs.push("-o", outputPath, url);
+        return curlArgs;
+    }
 
-            // Silent mode - don't log to avoid interfering with progress bar
+    /**
+     * curl --resolve arguments pinning the URL's host to its cached
+     * addresses. Each curl process would otherwise repeat the DNS lookup
+     */
+    private async getResolveArgs(url: string): Promise<string[]> {
+        let parsed: URL;
+        try {
+            parsed = new URL(url);
+        } catch {
+            return [];
+        }
 
-            // Execute curl using spawn (avoids shell parsing issues)
-            const result = await new Promise<{
-                success: boolean;
-                error?: string;
-            }>((resolve) => {
-                const curlProcess = spawn("curl", curlArgs, {
-                    stdio: "pipe",
-                });
+        const hostname = parsed.hostname;
+        if (!hostname || net.isIP(hostname.replace(/^\[|\]$/g, ""))) {
+            return [];
+        }
 
-                let errorOutput = "";
+        let lookup = this.resolvedHosts.get(hostname);
+        if (!lookup) {
+            lookup = dns.promises
+                .lookup(hostname, { all: true })
+                .then((results) => results.map((result) => result.address))
+                .catch(() => null);
+            this.resolvedHosts.set(hostname, lookup);
+        }
 
-                curlProcess.stderr?.on("data", (data) => {
-                    errorOutput += data.toString();
-                });
+        const addresses = await lookup;
+        if (!addresses || addresses.length === 0) {
+            return [];
+        }
 
-                curlProcess.on("close", (code) => {
-                    if (code === 0) {
-                        resolve({ success: true });
-                    } else {
-                        resolve({
-                            success: false,
-                            error: `Exit code ${code}: ${errorOutput}`,
-                        });
-                    }
-                });
+        // Pass every address so curl can still fail over between them
+        const port =
+            parsed.port || (parsed.protocol === "https:" ? "443" : "80");
+        const pinned = addresses
+            .map((address) =>
+                net.isIPv6(address) ? `[${address}]` : address
+            )
+            .join(",");
+        return ["--resolve", `${hostname}:${port}:${pinned}`];
+    }
+
+    /**
+     * Drop the pinned addresses for a URL's host after a failed request, so
+     * the next attempt resolves again (possibly to a different edge)
+     */
+    private forgetResolvedHost(url: string): void {
+        try {
+            this.resolvedHosts.delete(new URL(url).hostname);
+        } catch {
+            // Ignore URL parsing errors
+        }
+    }
+
+    /**
+     * Run curl and optionally forward its stdout chunks
+     */
+    private runCurl(
+        curlArgs: string[],
+        onData?: (chunk: Buffer) => void
+    ): Promise<{ success: boolean; error?: string }> {
+        // Execute curl using spawn (avoids shell parsing issues)
+        return new Promise((resolve) => {
+            const curlProcess = spawn("curl", curlArgs, {
+                stdio: "pipe",
+            });
+
+            let errorOutput = "";
+
+            if (onData) {
+                curlProcess.stdout?.on("data", onData);
+            }
+
+            curlProcess.stderr?.on("data", (data) => {
+                errorOutput += data.toString();
+            });
 
-                curlProcess.on("error", (error) => {
-                    resolve({ success: false, error: error.message });
+            // Set timeout
+            const timer = setTimeout(() => {
+                curlProcess.kill();
+                resolve({
+                    success: false,
+                    error: "Timeout after 90 seconds",
                 });
+            }, 90000);
 
-                // Set timeout
-                setTimeout(() => {
-                    curlProcess.kill();
+            curlProcess.on("close", (code) => {
+                clearTimeout(timer);
+                if (code === 0) {
+                    resolve({ success: true });
+                } else {
                     resolve({
                         success: false,
-                        error: "Timeout after 90 seconds",
+                        error: `Exit code ${code}: ${errorOutput}`,
                     });
-                }, 90000);
+                }
             });
 
+            curlProcess.on("error", (error) => {
+                clearTimeout(timer);
+                resolve({ success: false, error: error.message });
+            });
+        });
+    }
+
+    /**
+     * Download file using curl - much more reliable than custom HTTP implementation
+     */
+    async downloadFile(
+        url: string,
+        outputPath: string,
+        headers?: Record<string, string>
+    ): Promise<boolean> {
+        try {
+            const curlArgs = this.buildCurlArgs(headers);
+
+            curlArgs.push(...(await this.getResolveArgs(url)));
+
+            // Add URL and output
+            curlArgs.push("-o", outputPath, url);
+
+            // Silent mode - don't log to avoid interfering with progress bar
+            const result = await this.runCurl(curlArgs);
+
             if (!result.success) {
                 // Don't log curl errors to avoid interfering with progress bar
+                this.forgetResolvedHost(url);
                 return false;
             }
 
-            // Check if file was created and has content
-            if (fs.existsSync(outputPath) && fs.statSync(outputPath).size > 0) {
-                // Don't log individual successes to avoid interfering with progress bar
-                return true;
-            } else {
-                // Don't log individual failures to avoid interfering with progress bar
-                return false;
-            }
+            // Check if file was created and has content (a missing file
+            // rejects into the catch below)
+            const { size } = await fs.promises.stat(outputPath);
+            // Don't log individual results to avoid interfering with progress bar
+            return size > 0;
         } catch (error: any) {
             // Don't log curl errors to avoid interfering with progress bar
             return false;
@@ -172,25 +407,48 @@ class SimpleDownloader {
     }
 
     /**
-     * Download text content using curl
+     * Download content into memory using curl (no temp file). The body is
+     * returned as the chunks curl produced, without copying into one buffer
      */
-    async downloadText(
+    async downloadChunks(
         url: string,
         headers?: Record<string, string>
-    ): Promise<string | null> {
+    ): Promise<Buffer[] | null> {
         try {
-            const tempFile = path.join(
-                os.tmpdir(),
-                `temp_download_${Date.now()}.txt`
-            );
+            const curlArgs = this.buildCurlArgs(headers);
+            curlArgs.push(...(await this.getResolveArgs(url)), url);
+
+            const chunks: Buffer[] = [];
+            const result = await this.runCurl(curlArgs, (chunk) => {
+                chunks.push(chunk);
+            });
+
+            if (!result.success) {
+                this.forgetResolvedHost(url);
+                return null;
+            }
 
-            if (await this.downloadFile(url, tempFile, headers)) {
-                const content = fs.readFileSync(tempFile, "utf8");
-                fs.unlinkSync(tempFile); // Clean up temp file
-                return content;
+            if (chunks.length === 0) {
+                return null;
             }
 
+            return chunks;
+        } catch (error: any) {
             return null;
+        }
+    }
+
+    /**
+     * Download text content using curl
+     */
+    async downloadText(
+        url: string,
+        headers?: Record<string, string>
+    ): Promise<string | null> {
+        try {
+            // Read curl's stdout directly instead of round-tripping a temp file
+            const chunks = await this.downloadChunks(url, headers);
+            return chunks ? Buffer.concat(chunks).toString("utf8") : null;
         } catch (error) {
             this.logger?.error(`Text download failed: ${error}`);
             return null;
@@ -208,13 +466,14 @@ export class M3U8Processor {
     private logger: Logger;
     private downloader: SimpleDownloader;
     private tempDir: string | null = null;
-    private segmentFiles: string[] = [];
+    private segmentFiles: Array<string | null> = [];
     private config: M3U8ProcessorConfig;
     private progressBar: cliProgress.SingleBar | null = null;
     private progressUpdateLock: boolean = false;
     private completedSegments: number = 0;
     private totalSegments: number = 0;
     private downloadStartTime: number = 0;
+    private lastProgressRender: number = 0;
 
     constructor(config: M3U8ProcessorConfig = {}) {
         this.logger = createLogger("M3U8Processor");
@@ -232,22 +491,7 @@ export class M3U8Processor {
 
         // Create simple curl-based downloader with EXACT same headers as Python script
         this.downloader = new SimpleDownloader({
-            // EXACT headers from working Python script (lines 26-38 in m3u8_downloader.py)
-            headers: {
-                "User-Agent":
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                Accept: "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Accept-Encoding": "gzip, deflate, br",
-                DNT: "1",
-                Connection: "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-                "Sec-Fetch-Dest": "document",
-                "Sec-Fetch-Mode": "navigate",
-                "Sec-Fetch-Site": "none",
-                "Sec-Fetch-User": "?1",
-                "Cache-Control": "max-age=0",
-            },
+            headers: { ...DEFAULT_HEADERS },
         });
 
         // Set logger for downloader
@@ -275,48 +519,28 @@ export class M3U8Processor {
         m3u8Url?: string
     ): void {
         // Start with EXACT Python session headers (lines 26-38 in m3u8_downloader.py)
-        this.downloader.defaults.headers.common = {
-            "User-Agent":
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            Accept: "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept-Encoding": "gzip, deflate, br",
-            DNT: "1",
-            Connection: "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-            "Sec-Fetch-Dest": "document",
-            "Sec-Fetch-Mode": "navigate",
-            "Sec-Fetch-Site": "none",
-            "Sec-Fetch-User": "?1",
-            "Cache-Control": "max-age=0",
-        };
+        const sessionHeaders: Record<string, string> = { ...DEFAULT_HEADERS };
 
         // Add any custom headers from browser context (like Python custom_headers logic)
         if (headers["Referer"]) {
-            this.downloader.defaults.headers.common["Referer"] =
-                headers["Referer"];
+            sessionHeaders["Referer"] = headers["Referer"];
         } else if (m3u8Url) {
             // If no referer provided, use the M3U8 domain as referer (common requirement)
             try {
                 const url = new URL(m3u8Url);
-                this.downloader.defaults.headers.common[
-                    "Referer"
-                ] = `${url.protocol}//${url.host}/`;
+                sessionHeaders["Referer"] = `${url.protocol}//${url.host}/`;
             } catch (e) {
                 // Ignore URL parsing errors
             }
         }
 
         if (headers["Origin"]) {
-            this.downloader.defaults.headers.common["Origin"] =
-                headers["Origin"];
+            sessionHeaders["Origin"] = headers["Origin"];
         } else if (m3u8Url) {
             // If no origin provided, use the M3U8 domain as origin (common requirement)
             try {
                 const url = new URL(m3u8Url);
-                this.downloader.defaults.headers.common[
-                    "Origin"
-                ] = `${url.protocol}//${url.host}`;
+                sessionHeaders["Origin"] = `${url.protocol}//${url.host}`;
             } catch (e) {
                 // Ignore URL parsing errors
             }
@@ -326,26 +550,13 @@ export class M3U8Processor {
         for (const [key, value] of Object.entries(headers)) {
             if (value && !["Referer", "Origin"].includes(key)) {
                 // Only add non-conflicting headers
-                if (
-                    ![
-                        "User-Agent",
-                        "Accept",
-                        "Accept-Language",
-                        "Accept-Encoding",
-                        "DNT",
-                        "Connection",
-                        "Upgrade-Insecure-Requests",
-                        "Sec-Fetch-Dest",
-                        "Sec-Fetch-Mode",
-                        "Sec-Fetch-Site",
-                        "Sec-Fetch-User",
-                        "Cache-Control",
-                    ].includes(key)
-                ) {
-                    this.downloader.defaults.headers.common[key] = value;
+                if (!(key in DEFAULT_HEADERS)) {
+                    sessionHeaders[key] = value;
                 }
             }
         }
+
+        this.downloader.setHeaders(sessionHeaders);
     }
 
     /**
@@ -400,74 +611,95 @@ export class M3U8Processor {
     }
 
     /**
-     * Parse M3U8 content - EXACT replication of Python m3u8.loads() behavior
+     * Parse M3U8 content - single-pass line scanner covering what we use
+     * from Python m3u8.loads() (segment URIs and variant stream info)
      */
     private parseM3U8Content(content: string, baseUrl: string): Playlist {
-        const lines = content
-            .split("\n")
-            .map((line) => line.trim())
-            .filter((line) => line);
         const playlist: Playlist = { segments: [], playlists: [] };
 
-        // First pass - determine if this is a master playlist or media playlist
         let isMasterPlaylist = false;
-        for (const line of lines) {
-            if (line.startsWith("#EXT-X-STREAM-INF:")) {
-                isMasterPlaylist = true;
-                break;
+        let pendingStreamInfo: PlaylistInfo["streamInfo"] | null = null;
+        let pendingSegment = false;
+        let pendingDuration: number | undefined;
+        const unsupportedTags = new Set<string>();
+        let hasByteRanges = false;
+
+        let start = 0;
+        while (start < content.length) {
+            let end = content.indexOf("\n", start);
+            if (end === -1) {
+                end = content.length;
+            }
+            const line = content.slice(start, end).trim();
+            start = end + 1;
+
+            if (!line) {
+                continue;
+            }
+
+            if (line.startsWith("#")) {
+                if (line.startsWith("#EXTINF:")) {
+                    pendingSegment = true;
+                    pendingDuration = this.extractDuration(line);
+                } else if (line.startsWith("#EXT-X-STREAM-INF:")) {
+                    isMasterPlaylist = true;
+                    pendingStreamInfo = this.parseStreamInfo(line);
+                } else if (
+                    line.startsWith("#EXT-X-KEY:") &&
+                    !line.includes("METHOD=NONE")
+                ) {
+                    unsupportedTags.add("#EXT-X-KEY");
+                } else if (line.startsWith("#EXT-X-MAP:")) {
+                    unsupportedTags.add("#EXT-X-MAP");
+                } else if (line.startsWith("#EXT-X-BYTERANGE:")) {
+                    hasByteRanges = true;
+                }
+                continue;
+            }
+
+            // URI line - belongs to the most recent STREAM-INF or EXTINF
+            if (pendingStreamInfo) {
+                playlist.playlists!.push({
+                    uri: line,
+                    streamInfo: pendingStreamInfo,
+                });
+                pendingStreamInfo = null;
+            } else if (pendingSegment) {
+                playlist.segments.push({
+                    uri: line,
+                    duration: pendingDuration,
+                });
+                pendingSegment = false;
+                pendingDuration = undefined;
             }
         }
 
+        if (hasByteRanges) {
+            // Segments are slices of a shared resource; fetching each URI
+            // whole would mux the same media once per segment
+            this.logger.error(
+                "Playlist uses #EXT-X-BYTERANGE segments, which are not supported"
+            );
+            playlist.segments = [];
+        }
+
+        if (unsupportedTags.size > 0) {
+            this.logger.warn(
+                `Playlist uses ${Array.from(unsupportedTags).join(
+                    ", "
+                )} - segments are passed through as-is and may not convert`
+            );
+        }
+
         if (isMasterPlaylist) {
-            // Parse master playlist exactly like Python m3u8 library
             this.logger.info(
                 "Parsing master playlist (multiple quality streams)"
             );
-            let i = 0;
-            while (i < lines.length) {
-                const line = lines[i];
-
-                if (line.startsWith("#EXT-X-STREAM-INF:")) {
-                    const streamInfo = this.parseStreamInfo(line);
-                    const nextLine = lines[i + 1];
-                    if (nextLine && !nextLine.startsWith("#")) {
-                        playlist.playlists = playlist.playlists || [];
-                        playlist.playlists.push({
-                            uri: nextLine,
-                            streamInfo,
-                        });
-                    }
-                    i += 2;
-                } else {
-                    i++;
-                }
-            }
-
             this.logger.info(
                 `Found ${playlist.playlists?.length || 0} quality variants`
             );
         } else {
-            // Parse media playlist exactly like Python m3u8 library
             this.logger.info("Parsing media playlist (video segments)");
-            let i = 0;
-            while (i < lines.length) {
-                const line = lines[i];
-
-                if (line.startsWith("#EXTINF:")) {
-                    const duration = this.extractDuration(line);
-                    const nextLine = lines[i + 1];
-                    if (nextLine && !nextLine.startsWith("#")) {
-                        playlist.segments.push({
-                            uri: nextLine,
-                            duration,
-                        });
-                    }
-                    i += 2;
-                } else {
-                    i++;
-                }
-            }
-
             this.logger.info(
                 `Found ${playlist.segments.length} video segments`
             );
@@ -518,7 +750,7 @@ export class M3U8Processor {
     private selectBestQuality(
         masterPlaylist: Playlist,
         baseUrl: string
-    ): string | null {
+    ): { url: string; codecs?: string } | null {
         if (
             !masterPlaylist.playlists ||
             masterPlaylist.playlists.length === 0
@@ -530,7 +762,8 @@ export class M3U8Processor {
         // Extract available qualities exactly like Python
         const qualities: Array<{
             url: string;
-            resolution: string;
+            width: number;
+            height: number;
             bandwidth: number;
             playlist: PlaylistInfo;
         }> = [];
@@ -542,32 +775,43 @@ export class M3U8Processor {
             if (resolution) {
                 // Parse resolution like Python (width x height)
                 const [width, height] = resolution.split("x").map(Number);
+                if (!Number.isFinite(width) || !Number.isFinite(height)) {
+                    this.logger.debug(`Skipping invalid resolution: ${resolution}`);
+                    continue;
+                }
                 qualities.push({
                     url: playlist.uri,
-                    resolution: `${width}x${height}`,
+                    width,
+                    height,
                     bandwidth: bandwidth,
                     playlist: playlist,
                 });
             }
         }
 
+        if (qualities.length === 0) {
+            this.logger.error("No quality variants with a valid resolution");
+            return null;
+        }
+
         // Sort by resolution (height) exactly like Python
-        qualities.sort((a, b) => {
-            const heightA = parseInt(a.resolution.split("x")[1]);
-            const heightB = parseInt(b.resolution.split("x")[1]);
-            return heightB - heightA; // Descending order (best first)
-        });
+        qualities.sort((a, b) => b.height - a.height); // Descending order (best first)
 
         this.logger.info("Available qualities:");
         qualities.forEach((q, i) => {
-            this.logger.info(`${i + 1}. ${q.resolution} (${q.bandwidth} bps)`);
+            this.logger.info(
+                `${i + 1}. ${q.width}x${q.height} (${q.bandwidth} bps)`
+            );
         });
 
         // Auto-select best quality (like Python quality_preference='best')
         const selected = qualities[0];
-        this.logger.info(`Selected quality: ${selected.resolution}`);
+        this.logger.info(`Selected quality: ${selected.width}x${selected.height}`);
 
-        return this.resolveUrl(selected.url, baseUrl);
+        return {
+            url: this.resolveUrl(selected.url, baseUrl),
+            codecs: selected.playlist.streamInfo.codecs,
+        };
     }
 
     /**
@@ -578,6 +822,7 @@ export class M3U8Processor {
         this.stopProgressBar();
 
         // Initialize the progress display
+        this.lastProgressRender = Date.now();
         this.updateProgressDisplay(0, totalSegments, "0.0", "0.0");
     }
 
@@ -590,6 +835,12 @@ export class M3U8Processor {
         speed: string,
         percentage: string
     ): void {
+        // Carriage-return redraws only make sense on a terminal; when
+        // piped (CI, nohup, log files) the completion summary is logged
+        if (!process.stdout.isTTY) {
+            return;
+        }
+
         // Create a visual progress bar
         const barWidth = 40;
         const filledWidth = Math.round((completed / total) * barWidth);
@@ -628,7 +879,18 @@ export class M3U8Processor {
 
         try {
             this.completedSegments++;
-            const elapsed = (Date.now() - this.downloadStartTime) / 1000;
+
+            // Redraw at most every 100ms (always draw the final state)
+            const now = Date.now();
+            if (
+                now - this.lastProgressRender < 100 &&
+                this.completedSegments < this.totalSegments
+            ) {
+                return;
+            }
+            this.lastProgressRender = now;
+
+            const elapsed = (now - this.downloadStartTime) / 1000;
             const speed =
                 elapsed > 0
                     ? (this.completedSegments / elapsed).toFixed(1)
@@ -693,6 +955,109 @@ export class M3U8Processor {
         this.progressUpdateLock = false;
     }
 
+    /**
+     * Resolve every segment URL once, up front
+     */
+    private resolveSegmentUrls(playlist: Playlist, baseUrl: string): string[] {
+        return playlist.segments.map((segment) =>
+            this.resolveUrl(segment.uri, baseUrl)
+        );
+    }
+
+    /**
+     * Fetch with up to 10 attempts and progressive backoff
+     * (300ms, 600ms, 900ms... max 3s); null when every attempt failed
+     */
+    private async fetchWithRetries<T>(
+        fetchOnce: () => Promise<T | null>,
+        shouldStop?: () => boolean
+    ): Promise<T | null> {
+        const maxRetries = 10;
+
+        for (let attempt = 1; attempt <= maxRetries; attempt++) {
+            if (shouldStop?.()) {
+                return null;
+            }
+
+            try {
+                // Don't log individual downloads to avoid interfering with progress bar
+                const result = await fetchOnce();
+                if (result !== null) {
+                    return result;
+                }
+            } catch (error) {
+                // Don't log retry attempts to avoid interfering with progress bar
+            }
+
+            if (attempt < maxRetries) {
+                await this.sleep(Math.min(attempt * 300, 3000));
+            }
+        }
+
+        // Don't log final failure to avoid interfering with progress bar
+        return null;
+    }
+
+    /**
+     * Reset counters and start the progress line for a segment download
+     */
+    private startSegmentProgress(totalSegments: number, label: string): void {
+        this.totalSegments = totalSegments;
+        this.completedSegments = 0;
+        this.downloadStartTime = Date.now();
+
+        this.logger.info(
+            `Starting ${label.toLowerCase()} of ${this.totalSegments} segments...`
+        );
+
+        this.initializeProgressBar(this.totalSegments);
+    }
+
+    /**
+     * Stop the progress line and log the download summary
+     */
+    private finishSegmentProgress(successCount: number, label: string): void {
+        this.stopProgressBar();
+
+        const totalTime = (Date.now() - this.downloadStartTime) / 1000;
+        const avgSpeed =
+            totalTime > 0 ? (successCount / totalTime).toFixed(1) : "N/A";
+
+        // Clear the progress line and show completion message
+        if (process.stdout.isTTY) {
+            process.stdout.write("\r" + " ".repeat(100) + "\r"); // Clear the line
+        }
+        this.logger.info(
+            `${label} completed: ${successCount}/${
+                this.totalSegments
+            } segments successful in ${totalTime.toFixed(
+                1
+            )}s (avg: ${avgSpeed} seg/s)`
+        );
+    }
+
+    /**
+     * Accept partial success like Python (at least 80% of segments)
+     */
+    private meetsSuccessThreshold(successCount: number): boolean {
+        if (successCount === 0) {
+            this.logger.error("No segments were downloaded successfully");
+            return false;
+        }
+
+        const successRate = successCount / this.totalSegments;
+        if (successRate < 0.8) {
+            this.logger.error(
+                `Partial success: ${(successRate * 100).toFixed(
+                    1
+                )}% of segments downloaded`
+            );
+            return false;
+        }
+
+        return true;
+    }
+
     /**
      * Download video segments using curl - Much more reliable than custom HTTP
      */
@@ -710,162 +1075,333 @@ export class M3U8Processor {
         // Create temporary directory exactly like Python
         this.tempDir = fs.mkdtempSync(path.join(os.tmpdir(), "m3u8_download_"));
 
-        // Initialize progress tracking
-        this.totalSegments = playlist.segments.length;
-        this.completedSegments = 0;
-        this.downloadStartTime = Date.now();
-
-        this.logger.info(
-            `Starting download of ${this.totalSegments} segments...`
-        );
+        // One slot per playlist position; workers fill their own index
+        this.segmentFiles = new Array(playlist.segments.length).fill(null);
 
-        // Initialize progress bar
-        this.initializeProgressBar(this.totalSegments);
+        this.startSegmentProgress(playlist.segments.length, "Download");
 
         let successCount = 0;
+        const segmentUrls = this.resolveSegmentUrls(playlist, baseUrl);
+
+        // Dropped once a segment is still short after a re-fetch, since the
+        // origin then serves it that way and re-fetching only costs time
+        let checkTruncation = true;
 
         // Download function for a single segment using curl with 10x retry
         const downloadSegment = async (
-            segment: Segment,
+            segmentUrl: string,
             index: number
         ): Promise<boolean> => {
-            const maxRetries = 10;
-            const segmentUrl = this.resolveUrl(segment.uri, baseUrl);
             const segmentFile = path.join(
                 this.tempDir!,
                 `segment_${index.toString().padStart(5, "0")}.ts`
             );
 
-            for (let attempt = 1; attempt <= maxRetries; attempt++) {
-                try {
-                    // Don't log individual downloads to avoid interfering with progress bar
+            const downloaded = await this.fetchWithRetries(async () => {
+                if (
+                    !(await this.downloader.downloadFile(
+                        segmentUrl,
+                        segmentFile
+                    ))
+                ) {
+                    return null;
+                }
+                if (
+                    !checkTruncation ||
+                    !(await fileLooksTruncated(segmentFile))
+                ) {
+                    return segmentFile;
+                }
 
-                    // Use curl to download segment
-                    const success = await this.downloader.downloadFile(
+                // Cut off mid-packet - fetch once more right away
+                if (
+                    !(await this.downloader.downloadFile(
                         segmentUrl,
                         segmentFile
+                    ))
+                ) {
+                    return null;
+                }
+                if (await fileLooksTruncated(segmentFile)) {
+                    checkTruncation = false;
+                    this.logger.debug(
+                        `Segment ${index + 1} is truncated at the source, skipping further TS checks`
                     );
+                }
+                return segmentFile;
+            });
 
-                    if (success) {
-                        this.segmentFiles.push(segmentFile);
-                        successCount++;
+            if (!downloaded) {
+                return false;
+            }
 
-                        // Update progress bar atomically
-                        this.incrementProgress();
+            this.segmentFiles[index] = segmentFile;
+            successCount++;
 
-                        // Progress callback like Python tqdm
-                        if (progressCallback) {
-                            progressCallback(successCount, this.totalSegments);
-                        }
+            // Update progress bar atomically
+            this.incrementProgress();
 
-                        return true;
-                    } else {
-                        if (attempt < maxRetries) {
-                            const delay = Math.min(attempt * 300, 3000); // Progressive delays: 300ms, 600ms, 900ms... max 3s
-                            await new Promise((resolve) =>
-                                setTimeout(resolve, delay)
-                            );
-                        }
-                    }
-                } catch (error) {
-                    // Don't log retry attempts to avoid interfering with progress bar
-
-                    if (attempt < maxRetries) {
-                        const delay = Math.min(attempt * 300, 3000); // Progressive delays: 300ms, 600ms, 900ms... max 3s
-                        await new Promise((resolve) =>
-                            setTimeout(resolve, delay)
-                        );
-                    }
-                }
+            // Progress callback like Python tqdm
+            if (progressCallback) {
+                progressCallback(successCount, this.totalSegments);
             }
 
-            // Don't log final failure to avoid interfering with progress bar
+            return true;
+        };
+
+        // Worker pool exactly like Python ThreadPoolExecutor(max_workers)
+        await this.runWithConcurrency(
+            segmentUrls,
+            maxWorkers,
+            downloadSegment
+        );
+
+        this.finishSegmentProgress(successCount, "Download");
+
+        if (!this.meetsSuccessThreshold(successCount)) {
             return false;
+        }
+
+        this.logger.info(
+            `Successfully downloaded ${successCount} segments via direct HTTP`
+        );
+        return true;
+    }
+
+    /**
+     * Download segments into memory and pipe them to a single FFmpeg process
+     * in playlist order, muxing while the download is still running
+     */
+    private async pipeSegmentsToMp4(
+        playlist: Playlist,
+        baseUrl: string,
+        maxWorkers: number,
+        outputFilename: string,
+        shortProbe: boolean = false
+    ): Promise<PipeResult> {
+        if (!playlist.segments || playlist.segments.length === 0) {
+            this.logger.error("No segments found in playlist");
+            return "download_failed";
+        }
+
+        // Ensure output directory exists
+        const outputDir = path.dirname(outputFilename);
+        if (!fs.existsSync(outputDir)) {
+            fs.mkdirSync(outputDir, { recursive: true });
+        }
+
+        this.startSegmentProgress(playlist.segments.length, "Piped download");
+
+        // Single FFmpeg process reading MPEG-TS from stdin
+        const ffmpeg = this.spawnFFmpeg([
+            ...(shortProbe ? SHORT_PROBE_ARGS : []),
+            "-f",
+            "mpegts",
+            "-i",
+            "pipe:0",
+            "-c:v",
+            "copy", // Copy video codec
+            "-c:a",
+            "copy", // Copy audio codec
+            "-f",
+            "mp4",
+            "-y", // Overwrite output
+            outputFilename,
+        ]);
+        const stdin = ffmpeg.process.stdin!;
+        let stdinOpen = true;
+
+        stdin.on("error", (error) => {
+            // FFmpeg exited early (EPIPE) - the exit code reports the failure
+            this.logger.debug(`FFmpeg stdin error: ${error}`);
+            stdinOpen = false;
+        });
+
+        // Once FFmpeg has failed, nothing downloaded can be used - stop
+        // claiming segments instead of fetching the rest of the playlist
+        let muxFailed = false;
+
+        // Completed segments waiting for their turn (null = failed segment)
+        const pending = new Map<number, Buffer[] | null>();
+        let nextToWrite = 0;
+
+        // Watermark: a segment may only start downloading once it is within
+        // reorderWindow of the write cursor, so one slow segment can't make
+        // the rest of the playlist pile up in memory behind it
+        const reorderWindow = Math.max(maxWorkers * 4, 16);
+        let windowWaiters: Array<{ index: number; resolve: () => void }> =
+            [];
+
+        const waitForWindow = (index: number): Promise<void> => {
+            if (index < nextToWrite + reorderWindow) {
+                return Promise.resolve();
+            }
+            return new Promise<void>((resolve) => {
+                windowWaiters.push({ index, resolve: () => resolve() });
+            });
         };
 
-        // Use Promise.all with concurrency limit exactly like Python ThreadPoolExecutor
-        const semaphore = Array(maxWorkers).fill(0);
-        const downloadPromises = playlist.segments.map((segment, index) => {
-            return new Promise<boolean>((resolve) => {
-                const execute = async () => {
-                    const result = await downloadSegment(segment, index);
-                    resolve(result);
-                };
-
-                // Wait for available worker slot
-                const waitForSlot = () => {
-                    const availableIndex = semaphore.findIndex(
-                        (slot) => slot === 0
-                    );
-                    if (availableIndex !== -1) {
-                        semaphore[availableIndex] = 1;
-                        execute().finally(() => {
-                            semaphore[availableIndex] = 0;
-                        });
-                    } else {
-                        setTimeout(waitForSlot, 10);
+        const drainPending = () => {
+            // Cork so every chunk of every segment that became writable
+            // goes to FFmpeg as one gathered writev() on uncork
+            const corked = stdinOpen && pending.has(nextToWrite);
+            if (corked) {
+                stdin.cork();
+            }
+
+            while (pending.has(nextToWrite)) {
+                const data = pending.get(nextToWrite);
+                pending.delete(nextToWrite);
+                if (data && stdinOpen) {
+                    for (const chunk of data) {
+                        stdin.write(chunk);
                     }
-                };
+                }
+                nextToWrite++;
+            }
 
-                waitForSlot();
+            if (corked) {
+                stdin.uncork();
+            }
+
+            windowWaiters = windowWaiters.filter((waiter) => {
+                if (waiter.index < nextToWrite + reorderWindow) {
+                    waiter.resolve();
+                    return false;
+                }
+                return true;
             });
+        };
+
+        ffmpeg.done.then((ok) => {
+            if (!ok) {
+                muxFailed = true;
+                windowWaiters.forEach((waiter) => waiter.resolve());
+                windowWaiters = [];
+            }
         });
 
-        // Wait for all downloads like Python
-        await Promise.all(downloadPromises);
+        let successCount = 0;
+        const segmentUrls = this.resolveSegmentUrls(playlist, baseUrl);
 
-        // Stop progress bar and show summary
-        this.stopProgressBar();
+        // Dropped once a segment is still short after a re-fetch, since the
+        // origin then serves it that way and re-fetching only costs time
+        let checkTruncation = true;
 
-        const totalTime = (Date.now() - this.downloadStartTime) / 1000;
-        const avgSpeed =
-            totalTime > 0 ? (successCount / totalTime).toFixed(1) : "N/A";
+        const downloadSegment = async (
+            segmentUrl: string,
+            index: number
+        ): Promise<boolean> => {
+            await waitForWindow(index);
+
+            // Let FFmpeg catch up before buffering more segments
+            if (stdinOpen && stdin.writableNeedDrain) {
+                await Promise.race([
+                    once(stdin, "drain").catch(() => undefined),
+                    ffmpeg.done, // FFmpeg exited - nothing left to wait for
+                ]);
+            }
 
-        // Clear the progress line and show completion message
-        process.stdout.write("\r" + " ".repeat(100) + "\r"); // Clear the line
-        this.logger.info(
-            `Download completed: ${successCount}/${
-                this.totalSegments
-            } segments successful in ${totalTime.toFixed(
-                1
-            )}s (avg: ${avgSpeed} seg/s)`
+            const data = await this.fetchWithRetries(async () => {
+                const chunks = await this.downloader.downloadChunks(
+                    segmentUrl
+                );
+                if (
+                    !chunks ||
+                    !checkTruncation ||
+                    !chunksLookTruncated(chunks)
+                ) {
+                    return chunks;
+                }
+
+                // Cut off mid-packet - fetch once more right away
+                const refetched = await this.downloader.downloadChunks(
+                    segmentUrl
+                );
+                if (!refetched) {
+                    return chunks;
+                }
+                if (chunksLookTruncated(refetched)) {
+                    checkTruncation = false;
+                    this.logger.debug(
+                        `Segment ${index + 1} is truncated at the source, skipping further TS checks`
+                    );
+                }
+                // FFmpeg's demuxer drops the partial packet, so pass it on
+                return refetched;
+            }, () => muxFailed);
+
+            if (data) {
+                successCount++;
+                this.incrementProgress();
+            }
+
+            // A failed segment is skipped so later segments are not held back
+            pending.set(index, data);
+            drainPending();
+            return data !== null;
+        };
+
+        // Worker pool exactly like Python ThreadPoolExecutor(max_workers)
+        await this.runWithConcurrency(
+            segmentUrls,
+            maxWorkers,
+            downloadSegment,
+            () => muxFailed
         );
+        const abortedEarly = muxFailed;
 
-        if (successCount === 0) {
-            this.logger.error("No segments were downloaded successfully");
-            return false;
+        // All segments written - let FFmpeg finalize the MP4
+        stdin.end();
+        const muxed = await ffmpeg.done;
+
+        this.finishSegmentProgress(successCount, "Piped download");
+
+        if (abortedEarly) {
+            this.logger.warn("Piped FFmpeg mux failed during download");
+            this.removeOutput(outputFilename);
+            return "mux_failed";
         }
 
-        // Accept partial success like Python (at least 80% of segments)
-        const successRate = successCount / this.totalSegments;
-        if (successRate < 0.8) {
-            this.logger.warn(
-                `Partial success: ${(successRate * 100).toFixed(
-                    1
-                )}% - will try curl fallback`
-            );
-            return false; // Force fallback to curl method
-        } else {
-            this.logger.info(
-                `Successfully downloaded ${successCount} segments via direct HTTP`
-            );
-            return true;
+        // Missing segments won't come back on a second pass - fail like Python
+        if (!this.meetsSuccessThreshold(successCount)) {
+            this.removeOutput(outputFilename);
+            return "download_failed";
+        }
+
+        if (!muxed) {
+            this.logger.warn("Piped FFmpeg mux failed");
+            this.removeOutput(outputFilename);
+            return "mux_failed";
         }
 
-        return successCount > 0; // Return true if we got at least some segments
+        this.logger.info("Conversion completed successfully");
+        return "success";
+    }
+
+    /**
+     * Remove a partial/corrupt output file left by a failed mux
+     */
+    private removeOutput(outputFilename: string): void {
+        try {
+            fs.rmSync(outputFilename, { force: true });
+        } catch (error) {
+            this.logger.warn(`Failed to remove ${outputFilename}: ${error}`);
+        }
     }
 
     /**
      * Convert downloaded segments to MP4 - equivalent of Python _convert_to_mp4
      */
     private async convertToMp4(outputFilename: string): Promise<boolean> {
-        if (this.segmentFiles.length === 0) {
+        const orderedSegments = this.getOrderedSegmentFiles();
+        if (orderedSegments.length === 0) {
             this.logger.error("No segments to convert");
             return false;
         }
 
         this.logger.info(
-            `Converting ${this.segmentFiles.length} segments to MP4: ${outputFilename}`
+            `Converting ${orderedSegments.length} segments to MP4: ${outputFilename}`
         );
 
         try {
@@ -875,22 +1411,17 @@ export class M3U8Processor {
                 fs.mkdirSync(outputDir, { recursive: true });
             }
 
-            // Create concatenation file for ffmpeg
-            const concatFile = path.join(this.tempDir!, "concat.txt");
-            const sortedSegments = this.segmentFiles.sort();
-            const concatContent = sortedSegments
-                .map((file) => `file '${file}'`)
-                .join("\n");
-            fs.writeFileSync(concatFile, concatContent);
+            // MPEG-TS is packet-synchronous, so the segments can simply be
+            // appended into one stream and remuxed in a single pass
+            const joinedFile = await this.joinSegmentFiles(orderedSegments);
 
-            // Use ffmpeg to concatenate and convert
+            // Default probe on purpose: this runs after the piped mux failed,
+            // possibly because its short probe missed a stream
             const ffmpegArgs = [
                 "-f",
-                "concat",
-                "-safe",
-                "0",
+                "mpegts",
                 "-i",
-                concatFile,
+                joinedFile,
                 "-c:v",
                 "copy", // Copy video codec
                 "-c:a",
@@ -916,6 +1447,55 @@ export class M3U8Processor {
         }
     }
 
+    /**
+     * Downloaded segment files in playlist order, skipping failed segments
+     */
+    private getOrderedSegmentFiles(): string[] {
+        return this.segmentFiles.filter(
+            (file): file is string => file !== null
+        );
+    }
+
+    /**
+     * Append segment files into a single joined.ts in the temp directory.
+     * One reusable 1 MiB buffer, one read + one write per chunk
+     */
+    private async joinSegmentFiles(segmentFiles: string[]): Promise<string> {
+        const joinedFile = path.join(this.tempDir!, "joined.ts");
+        const output = await fs.promises.open(joinedFile, "w");
+        const buffer = Buffer.allocUnsafe(1024 * 1024);
+
+        try {
+            for (const file of segmentFiles) {
+                const input = await fs.promises.open(file, "r");
+                try {
+                    let bytesRead: number;
+                    do {
+                        ({ bytesRead } = await input.read(
+                            buffer,
+                            0,
+                            buffer.length,
+                            null
+                        ));
+                        if (bytesRead > 0) {
+                            await output.write(buffer, 0, bytesRead);
+                        }
+                    } while (bytesRead > 0);
+                } finally {
+                    await input.close();
+                }
+            }
+        } catch (error) {
+            await output.close();
+            // Don't leave a partial file for convertAlternative to reuse
+            fs.rmSync(joinedFile, { force: true });
+            throw error;
+        }
+
+        await output.close();
+        return joinedFile;
+    }
+
     /**
      * Alternative conversion method - equivalent of Python _convert_alternative
      */
@@ -923,22 +1503,24 @@ export class M3U8Processor {
         try {
             this.logger.info("Trying alternative conversion method...");
 
-            const concatFile = path.join(this.tempDir!, "concat.txt");
-            const sortedSegments = this.segmentFiles.sort();
-            const concatContent = sortedSegments
-                .map((file) => `file '${file}'`)
-                .join("\n");
-            fs.writeFileSync(concatFile, concatContent);
+            // Reuse the joined stream from convertToMp4 when it got that far
+            let joinedFile = path.join(this.tempDir!, "joined.ts");
+            if (!fs.existsSync(joinedFile)) {
+                joinedFile = await this.joinSegmentFiles(
+                    this.getOrderedSegmentFiles()
+                );
+            }
 
-            const ffmpegArgs = [
+            const buildArgs = (encoder: string) => [
                 "-f",
-                "concat",
-                "-safe",
-                "0",
+                "mpegts",
                 "-i",
-                concatFile,
+                joinedFile,
                 "-c:v",
-                "libx264", // Use h264 codec
+                encoder, // Hardware h264 encoder when available
+                ...h264EncoderArgs(encoder),
+                "-threads",
+                "0", // Use all cores
                 "-c:a",
                 "aac", // Use AAC audio codec
                 "-f",
@@ -947,7 +1529,19 @@ export class M3U8Processor {
                 outputFilename,
             ];
 
-            const success = await this.runFFmpeg(ffmpegArgs);
+            const ffmpegPath = this.config.ffmpegPath || "ffmpeg";
+            const encoder = detectH264Encoder(ffmpegPath);
+            this.logger.info(`Re-encoding with ${encoder}`);
+
+            let success = await this.runFFmpeg(buildArgs(encoder));
+
+            // Encoder compiled in but no usable device - retry in software
+            if (!success && encoder !== "libx264") {
+                this.logger.warn(`${encoder} failed, retrying with libx264`);
+                // Don't try the hardware encoder again on later fallbacks
+                h264Encoders.set(ffmpegPath, "libx264");
+                success = await this.runFFmpeg(buildArgs("libx264"));
+            }
 
             if (success) {
                 this.logger.info(
@@ -968,9 +1562,19 @@ export class M3U8Processor {
      * Run FFmpeg with given arguments
      */
     private async runFFmpeg(args: string[]): Promise<boolean> {
-        return new Promise((resolve) => {
-            const ffmpeg = spawn(this.config.ffmpegPath || "ffmpeg", args);
+        return this.spawnFFmpeg(args).done;
+    }
+
+    /**
+     * Spawn FFmpeg and return the process along with a completion promise
+     */
+    private spawnFFmpeg(args: string[]): {
+        process: ChildProcess;
+        done: Promise<boolean>;
+    } {
+        const ffmpeg = spawn(this.config.ffmpegPath || "ffmpeg", args);
 
+        const done = new Promise<boolean>((resolve) => {
             let hasError = false;
 
             ffmpeg.stderr?.on("data", (data) => {
@@ -995,6 +1599,8 @@ export class M3U8Processor {
                 resolve(false);
             });
         });
+
+        return { process: ffmpeg, done };
     }
 
     /**
@@ -1005,15 +1611,41 @@ export class M3U8Processor {
         this.stopProgressBar();
 
         if (this.tempDir && fs.existsSync(this.tempDir)) {
+            // Synchronous on purpose: the CLI calls process.exit() as soon as
+            // processM3U8 resolves, which would kill a background removal
             try {
                 fs.rmSync(this.tempDir, { recursive: true, force: true });
             } catch (error) {
                 this.logger.warn(`Failed to cleanup temp directory: ${error}`);
             }
         }
+        this.tempDir = null;
         this.segmentFiles = [];
     }
 
+    /**
+     * Run worker over items with at most `limit` in flight. Each lane pulls
+     * the next index as soon as its previous item settles (no polling)
+     */
+    private async runWithConcurrency<T>(
+        items: T[],
+        limit: number,
+        worker: (item: T, index: number) => Promise<unknown>,
+        shouldStop?: () => boolean
+    ): Promise<void> {
+        let nextIndex = 0;
+
+        const lane = async (): Promise<void> => {
+            while (nextIndex < items.length && !shouldStop?.()) {
+                const index = nextIndex++;
+                await worker(items[index], index);
+            }
+        };
+
+        const lanes = Math.max(1, Math.min(limit, items.length));
+        await Promise.all(Array.from({ length: lanes }, () => lane()));
+    }
+
     /**
      * Resolve URL relative to base URL
      */
@@ -1093,39 +1725,73 @@ export class M3U8Processor {
 
             // Step 2: Handle master playlist if needed
             let finalPlaylist = playlist;
+            let finalPlaylistUrl = m3u8Url;
+            let shortProbe = false;
             if (playlist.playlists && playlist.playlists.length > 0) {
                 this.logger.debug(
                     "This appears to be a master playlist with multiple qualities"
                 );
-                const selectedUrl = this.selectBestQuality(playlist, m3u8Url);
+                const selected = this.selectBestQuality(playlist, m3u8Url);
 
-                if (!selectedUrl) {
+                if (!selected) {
                     return false;
                 }
 
+                const selectedUrl = selected.url;
+                if (selected.codecs) {
+                    // CODECS lists every stream in the variant, so FFmpeg only
+                    // has to find their parameters, not discover the streams
+                    this.logger.debug(
+                        `Stream codecs from playlist: ${selected.codecs}`
+                    );
+                    shortProbe = true;
+                }
+
                 this.logger.debug(`Selected quality URL: ${selectedUrl}`);
                 const selectedPlaylist = await this.parsePlaylist(selectedUrl);
                 if (!selectedPlaylist) {
                     return false;
                 }
                 finalPlaylist = selectedPlaylist;
+                // Segment URIs are relative to the variant, not the master
+                finalPlaylistUrl = selectedUrl;
             }
 
-            const segmentSuccess = await this.downloadSegments(
+            // Step 3: Download segments straight into FFmpeg's stdin
+            const pipeResult = await this.pipeSegmentsToMp4(
                 finalPlaylist,
-                m3u8Url,
-                this.config.maxWorkers || 4
+                finalPlaylistUrl,
+                this.config.maxWorkers || 4,
+                fullPath,
+                shortProbe
             );
-            if (!segmentSuccess) {
-                this.logger.error(
-                    "Failed to download segments"
-                );
+
+            if (pipeResult === "download_failed") {
+                this.logger.error("Failed to download segments");
                 return false;
             }
 
-            // Step 4: Convert to MP4
-            if (!(await this.convertToMp4(fullPath))) {
-                return false;
+            if (pipeResult === "mux_failed") {
+                // Fallback: segment files on disk joined into one TS
+                this.logger.warn(
+                    "Piped conversion failed, falling back to segment files"
+                );
+                const segmentSuccess = await this.downloadSegments(
+                    finalPlaylist,
+                    finalPlaylistUrl,
+                    this.config.maxWorkers || 4
+                );
+                if (!segmentSuccess) {
+                    this.logger.error(
+                        "Failed to download segments"
+                    );
+                    return false;
+                }
+
+                // Step 4: Convert to MP4
+                if (!(await this.convertToMp4(fullPath))) {
+                    return false;
+                }
             }
 
             this.logger.info(`Download completed successfully: ${fullPath}`);
@@ -1261,6 +1927,7 @@ export class M3U8Processor {
         this.totalSegments = playlist.segments.length;
         this.completedSegments = 0;
         this.downloadStartTime = Date.now();
+        this.segmentFiles = new Array(this.totalSegments).fill(null);
 
         this.logger.info(`Starting browser download of ${this.totalSegments} segments...`);
         this.initializeProgressBar(this.totalSegments);
@@ -1268,10 +1935,10 @@ export class M3U8Processor {
         let successCount = 0;
         const startTime = Date.now();
 
+        const segmentUrls = this.resolveSegmentUrls(playlist, baseUrl);
+
         // Simplified download function
-        const downloadSegment = async (segment: Segment, index: number): Promise<boolean> => {
-            const segmentUrl = this.resolveUrl(segment.uri, baseUrl);
-            
+        const downloadSegment = async (segmentUrl: string, index: number): Promise<boolean> => {
             try {
                 const segmentData = await browserPage.evaluate(
                     (params: { url: string; headers: Record<string, string> }) => {
@@ -1306,8 +1973,8 @@ export class M3U8Processor {
 
                 if (segmentData.success) {
                     const segmentFile = path.join(this.tempDir!, `segment_${index.toString().padStart(5, "0")}.ts`);
-                    fs.writeFileSync(segmentFile, Buffer.from(segmentData.data));
-                    this.segmentFiles.push(segmentFile);
+                    await fs.promises.writeFile(segmentFile, Buffer.from(segmentData.data));
+                    this.segmentFiles[index] = segmentFile;
                     successCount++;
                     this.incrementProgress();
                     return true;
@@ -1320,32 +1987,11 @@ export class M3U8Processor {
 
         // Download with concurrency limit
         const maxWorkers = 4;
-        const semaphore = Array(maxWorkers).fill(0);
-        const downloadPromises = playlist.segments.map((segment, index) => {
-            return new Promise<boolean>((resolve) => {
-                const execute = async () => {
-                    const result = await downloadSegment(segment, index);
-                    resolve(result);
-                };
-
-                const waitForSlot = () => {
-                    const availableIndex = semaphore.findIndex((slot) => slot === 0);
-                    if (availableIndex !== -1) {
-                        semaphore[availableIndex] = 1;
-                        execute().finally(() => {
-                            semaphore[availableIndex] = 0;
-                        });
-                        
-                    } else {
-                        setTimeout(waitForSlot, 10);
-                    }
-                };
-
-                waitForSlot();
-            });
-        });
-
-        await Promise.all(downloadPromises);
+        await this.runWithConcurrency(
+            segmentUrls,
+            maxWorkers,
+            downloadSegment
+        );
         this.stopProgressBar();
 
         const totalTime = (Date.now() - startTime) / 1000;